@@ -8,46 +8,160 @@ it backs up each contact's full details via the DevRev API (rev-users.get) to en
 The script supports a dry-run mode for simulation and outputs a JSON report.
 """
 
-import csv
 import argparse
 import logging
+import logging.handlers
 import json
 import os
+import queue
+import re
+import numpy as np
+import orjson
+import pandas as pd
 import requests
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional
+from typing import Any, BinaryIO, Iterable, Iterator, List, Dict, Set, Tuple
 from dotenv import load_dotenv
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; without it primaries are picked with one np.argmax per group
+    njit = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; without it the CSV is parsed on every run
+    pa = None
+
 # Load environment variables from .env
 load_dotenv()
 DEVREV_BASE_URL = os.getenv("DEVREV_BASE_URL")
 DEVREV_API_TOKEN = os.getenv("DEVREV_API_TOKEN")
+# Built once at import; every backup/merge call reuses them as-is
+_BACKUP_URL = f"{(DEVREV_BASE_URL or '').rstrip('/')}/rev-users/get"
+_MERGE_URL = f"{(DEVREV_BASE_URL or '').rstrip('/')}/rev-users/merge"
+_HEADERS = {
+    "Authorization": f"Bearer {DEVREV_API_TOKEN}",
+    "Content-Type": "application/json",
+    "Accept": "application/json"
+}
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "0.3"))
+# Number of merge pairs whose backups are fetched together before the pairs are merged
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "100"))
+
+# Number of backup calls in flight at once
+MAX_WORKERS = 16
+
+BACKUP_DIR = "backups"
+# Shared by every backup file and the report of this run
+RUN_TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger("dedupe")
 
+# One pooled session shared by all worker threads, so connections (and TLS handshakes) are reused.
+SESSION = requests.Session()
+# Merges are not idempotent: only retry when the request never reached the server (connect errors)
+# or was explicitly throttled (429). Read errors and 5xx responses are never re-sent.
+_MERGE_ADAPTER = HTTPAdapter(
+    max_retries=Retry(
+        total=MAX_RETRIES,
+        read=0,
+        other=0,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=[429],
+        allowed_methods=frozenset(["POST"]),
+        raise_on_status=False
+    )
+)
+SESSION.mount("https://", _MERGE_ADAPTER)
+SESSION.mount("http://", _MERGE_ADAPTER)
+
+def mount_backup_adapter(pool_size: int) -> None:
+    """
+    Mount the backup adapter with one pooled connection per concurrent backup call.
+    rev-users.get is read-only, so backups are safe to re-send on any transient failure.
+    Mounted on the backup URL itself, which takes precedence over the scheme-wide adapter above.
+    """
+    SESSION.mount(_BACKUP_URL, HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=MAX_RETRIES,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False
+        )
+    ))
+
+mount_backup_adapter(MAX_WORKERS)
+
+# Columns read from the pivot CSV; any column missing from the file is treated as empty
+CSV_COLUMNS = [
+    "Email", "External Ref", "Modified By Name", "User ID", "Type", "Display ID",
+    "Devrev Account ID", "Devrev Account Name", "Updated At", "CXP User id",
+    "Updated by BI service", "Linked to acc", "Tickets", "Action", "Strategy"
+]
+CSV_COLUMN_INDEX = {name: i for i, name in enumerate(CSV_COLUMNS)}
+
+# Rows whose email contains any of these markers are test/internal contacts and are never deduped.
+# All markers are matched in a single pass by one compiled alternation.
+EXCLUDED_EMAIL_MARKERS = ["test@", "vg@"]
+_EXCLUDE_RE = re.compile("|".join(re.escape(marker) for marker in EXCLUDED_EMAIL_MARKERS))
+
+# Low-cardinality columns stored dictionary-encoded (one copy of each distinct string plus integer codes)
+CATEGORY_COLUMNS = [
+    "Type", "Devrev Account Name", "Devrev Account ID", "Modified By Name", "Updated by BI service", "CXP User id"
+]
+
+# Columns that identify a set of duplicate contacts
+GROUP_KEYS = ["Email", "Devrev Account ID"]
+
+# Priority score layout used to pick the primary of a group (highest score wins, first row on ties):
+#   bit 35     - Velocity Global - OTHER group and External Ref equals User ID (strategy 5)
+#   bit 34     - Upwork group and an Upwork-specific External Ref (strategy 4)
+#   bit 33     - has a CXP UID (strategy 1)
+#   bit 32     - has a CXP UID and was updated by the BI service (strategies 2-3)
+#   bits 0-31  - ticket count offset by -INT32_MIN, so negative counts keep their order
+# Rows that win through strategy 4 or 5 carry no lower bits, so the first matching row is chosen.
+VELOCITY_REAL_BIT = np.int64(1) << 35
+UPWORK_SPECIFIC_BIT = np.int64(1) << 34
+CXP_UID_BIT = np.int64(1) << 33
+UPDATED_BY_BI_BIT = np.int64(1) << 32
+TICKETS_OFFSET = -np.int64(np.iinfo(np.int32).min)
+
 class ExternalContact:
-    def __init__(self, row: Dict[str, str]):
-        self.email = row.get("Email", "").strip().lower()
-        self.external_ref = row.get("External Ref", "").strip()
-        self.modified_by = row.get("Modified By Name", "").strip()
-        self.user_id = row.get("User ID", "").strip()
-        self.type = row.get("Type", "").strip()
-        self.display_id = row.get("Display ID", "").strip()
-        self.devrev_account_id = row.get("Devrev Account ID", "").strip()
-        self.devrev_account_name = row.get("Devrev Account Name", "").strip()
-        self.updated_at = row.get("Updated At", "").strip()
-        self.cxp_user_id = row.get("CXP User id", "").strip().upper()
-        self.updated_by_bi = row.get("Updated by BI service", "").strip().upper()
-        self.linked_to_acc = row.get("Linked to acc", "").strip()
-        self.tickets = int(row.get("Tickets", "0").strip())
-        self.action = row.get("Action", "").strip()
-        self.strategy = row.get("Strategy", "").strip()
+    """
+    A single contact materialized from a row of the contacts DataFrame.
+    Only built for rows taking part in a merge; grouping and primary selection work on the frame.
+    """
+    __slots__ = (
+        "email", "external_ref", "modified_by", "user_id", "type", "display_id", "devrev_account_id",
+        "devrev_account_name", "updated_at", "cxp_user_id", "updated_by_bi", "linked_to_acc", "tickets",
+        "action", "strategy"
+    )
+    
+    def __init__(self, row: List[Any], col: Dict[str, int]):
+        self.email = row[col["Email"]]
+        self.external_ref = row[col["External Ref"]]
+        self.modified_by = row[col["Modified By Name"]]
+        self.user_id = row[col["User ID"]]
+        self.type = row[col["Type"]]
+        self.display_id = row[col["Display ID"]]
+        self.devrev_account_id = row[col["Devrev Account ID"]]
+        self.devrev_account_name = row[col["Devrev Account Name"]]
+        self.updated_at = row[col["Updated At"]]
+        self.cxp_user_id = row[col["CXP User id"]]
+        self.updated_by_bi = row[col["Updated by BI service"]]
+        self.linked_to_acc = row[col["Linked to acc"]]
+        self.tickets = int(row[col["Tickets"]])
+        self.action = row[col["Action"]]
+        self.strategy = row[col["Strategy"]]
     
     def has_cxp_uid(self) -> bool:
         return self.external_ref.startswith("user_")
@@ -72,170 +186,354 @@ class ExternalContact:
     def __repr__(self):
         return f"<Contact {self.email} | ext_ref: {self.external_ref} | acc: {self.devrev_account_id}>"
 
-def load_contacts(csv_path: str) -> List[ExternalContact]:
-    contacts = []
-    with open(csv_path, newline="", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            email = row.get("Email", "").strip().lower()
-            if "test@" in email or "vg@" in email:
-                continue
-            try:
-                contact = ExternalContact(row)
-                contacts.append(contact)
-            except Exception as e:
-                logger.error(f"Error parsing row: {row}. Exception: {e}")
-    logger.info(f"Loaded {len(contacts)} contacts from CSV.")
-    return contacts
-
-def group_contacts_by_email(contacts: List[ExternalContact]) -> Dict[str, List[ExternalContact]]:
-    groups = defaultdict(list)
-    for contact in contacts:
-        groups[contact.email].append(contact)
-    return groups
-
-def choose_primary_contact(group: List[ExternalContact]) -> Tuple[Optional[ExternalContact], List[ExternalContact]]:
-    if not group or len(group) < 2:
-        return None, []
+def _read_csv_c_engine(csv_path: str) -> pd.DataFrame:
+    # index_col=False stops a too-long first row from turning the first column into the index, and
+    # usecols makes the parser drop extra fields on any row (csv.DictReader ignored them too)
+    return pd.read_csv(
+        csv_path, dtype=str, engine="c", keep_default_na=False, index_col=False,
+        usecols=lambda name: name in CSV_COLUMN_INDEX
+    )
+
+def read_pivot_csv(csv_path: str) -> pd.DataFrame:
+    """
+    Parse the pivot CSV with the pyarrow engine, falling back to pandas' C engine.
+    Every column is read as a plain string so the values match what csv.DictReader produced.
+    Rows with extra fields (which pyarrow rejects) are parsed by the C engine with the extra fields dropped.
+    """
+    try:
+        df = pd.read_csv(csv_path, dtype=str, engine="pyarrow", keep_default_na=False)
+    except ImportError:
+        logger.warning("pyarrow CSV engine unavailable; falling back to the C engine.")
+        df = _read_csv_c_engine(csv_path)
+    except ValueError as e:
+        logger.warning(f"pyarrow CSV engine could not parse {csv_path} ({e}); retrying with the C engine.")
+        df = _read_csv_c_engine(csv_path)
+    return df.reindex(columns=CSV_COLUMNS, fill_value="")
+
+# Parquet schema metadata key holding the size and mtime of the CSV a cache was built from
+_CACHE_SOURCE_KEY = b"dedupe_source_csv"
+
+def _csv_signature(csv_path: str) -> bytes:
+    stat = os.stat(csv_path)
+    return orjson.dumps({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+
+def read_pivot_table(csv_path: str) -> pd.DataFrame:
+    """
+    Read the raw pivot table, reusing a Parquet copy of the parsed CSV (<csv_path>.parquet) when it was
+    built from a CSV with exactly the same size and mtime. Any other change to the CSV, including one
+    that moves its mtime backwards (cp -p, rsync -t, tar x), forces a reparse.
+    The cache holds the parsed strings only; normalization always reruns.
+    """
+    if pa is None:
+        return read_pivot_csv(csv_path)
     
-    primary = None
-    account_groups = defaultdict(list)
-    for contact in group:
-        account_groups[contact.devrev_account_id].append(contact)
+    cache_path = csv_path + ".parquet"
+    signature = _csv_signature(csv_path)
+    if os.path.exists(cache_path):
+        try:
+            if (pq.read_schema(cache_path).metadata or {}).get(_CACHE_SOURCE_KEY) == signature:
+                df = pd.read_parquet(cache_path)
+                logger.info(f"Read parsed CSV from cache {cache_path}")
+                return df
+            logger.info(f"CSV cache {cache_path} does not match {csv_path}; parsing the CSV.")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read CSV cache {cache_path} ({e}); parsing the CSV.")
     
-    merge_candidates = []
-    for acc, contacts_in_acc in account_groups.items():
-        if len(contacts_in_acc) < 2:
-            continue
-        
-        cxp_contacts = [c for c in contacts_in_acc if c.has_cxp_uid()]
-        if cxp_contacts and len(cxp_contacts) == 1:
-            primary = cxp_contacts[0]
-        elif cxp_contacts and len(cxp_contacts) > 1:
-            candidates = sorted(cxp_contacts, key=lambda c: (c.updated_by_bi_service(), c.tickets), reverse=True)
-            primary = candidates[0]
-        else:
-            primary = max(contacts_in_acc, key=lambda c: c.tickets)
-        
-        if any("upwork" in c.type.lower() for c in contacts_in_acc):
-            specific = [c for c in contacts_in_acc if "upwork" in c.external_ref.lower()]
-            if specific:
-                primary = specific[0]
-        
-        if any("velocity global - other" in c.devrev_account_name.lower() for c in contacts_in_acc):
-            real_accounts = [c for c in contacts_in_acc if c.external_ref == c.user_id]
-            if real_accounts:
-                primary = real_accounts[0]
-        
-        duplicates = [c for c in contacts_in_acc if c != primary]
-        merge_candidates.extend([(primary, dup) for dup in duplicates])
+    df = read_pivot_csv(csv_path)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _CACHE_SOURCE_KEY: signature})
+        pq.write_table(table, cache_path, compression="zstd")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not write CSV cache {cache_path}: {e}")
+    return df
+
+def load_contacts(csv_path: str) -> pd.DataFrame:
+    df = read_pivot_table(csv_path)
+    for col in CSV_COLUMNS:
+        df[col] = df[col].str.strip()
+    df["Email"] = df["Email"].str.lower()
+    df["CXP User id"] = df["CXP User id"].str.upper()
+    df["Updated by BI service"] = df["Updated by BI service"].str.upper()
+    df = df[~df["Email"].str.contains(_EXCLUDE_RE, na=False)]
+
+    tickets = pd.to_numeric(df["Tickets"], errors="coerce")
+    invalid = int(tickets.isna().sum())
+    if invalid:
+        logger.warning(f"{invalid} rows have a non-numeric Tickets value; treating them as 0.")
+    df = df.assign(Tickets=tickets.fillna(0).astype(np.int32)).reset_index(drop=True)
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+
+    # Derived flags are computed once for the whole column instead of per contact
+    df["has_cxp_uid"] = df["External Ref"].str.startswith("user_", na=False)
+    df["updated_by_bi_service"] = df["Updated by BI service"].eq("TRUE")
+    df["is_upwork_type"] = df["Type"].str.contains("upwork", case=False, regex=False, na=False)
+    df["is_upwork_ref"] = df["External Ref"].str.contains("upwork", case=False, regex=False, na=False)
+    df["is_vg_other"] = df["Devrev Account Name"].str.contains("velocity global - other", case=False, regex=False, na=False)
+    df["ref_eq_uid"] = df["External Ref"].eq(df["User ID"])
+    logger.info(f"Loaded {len(df)} contacts from CSV.")
+    return df
+
+def contacts_from_frame(df: pd.DataFrame, rows: List[int]) -> List[ExternalContact]:
+    """
+    Materialize contacts from plain row lists indexed by column position, instead of one dict per row.
+    """
+    values = df.iloc[rows, df.columns.get_indexer(CSV_COLUMNS)].to_numpy().tolist()
+    return [ExternalContact(row, CSV_COLUMN_INDEX) for row in values]
+
+def group_contacts(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sort-based grouping of rows by (email, DevRev account).
+    Returns (order, group_offsets, group_ids): group g is order[group_offsets[g]:group_offsets[g + 1]],
+    and group_ids maps every row to its group. Emails come in first-appearance order, the accounts of
+    an email in the order they first appear for it, and rows inside a group keep their CSV order.
+    """
+    email_col, account_col = GROUP_KEYS
+    email_codes = pd.factorize(df[email_col])[0].astype(np.int64)
+    account_codes = pd.factorize(df[account_col])[0].astype(np.int64)
+    # Codes numbered by first appearance of each (email, account) pair
+    pair_codes = pd.factorize((email_codes << 32) | account_codes)[0].astype(np.int64)
+    order = np.lexsort((pair_codes, email_codes))
+    key = pair_codes[order]
     
-    return primary, merge_candidates
+    is_start = np.empty(len(key), dtype=bool)
+    is_start[:1] = True
+    np.not_equal(key[1:], key[:-1], out=is_start[1:])
+    group_offsets = np.append(np.flatnonzero(is_start), len(key))
+    group_ids = np.empty(len(key), dtype=np.int64)
+    group_ids[order] = np.cumsum(is_start) - 1
+    return order, group_offsets, group_ids
+
+def group_any(mask: np.ndarray, group_ids: np.ndarray) -> np.ndarray:
+    """
+    For every row, whether any row of its group has mask set.
+    Short-circuits to the (all False) mask when no row matches at all, which is the common case.
+    """
+    if not mask.any():
+        return mask
+    return (np.bincount(group_ids[mask], minlength=group_ids.max() + 1) > 0)[group_ids]
+
+def priority_scores(df: pd.DataFrame, group_ids: np.ndarray) -> np.ndarray:
+    """
+    Compute the primary-selection priority of every row (see the score layout above).
+    """
+    in_upwork_group = group_any(df["is_upwork_type"].to_numpy(), group_ids)
+    in_vg_other_group = group_any(df["is_vg_other"].to_numpy(), group_ids)
+    
+    is_upwork_specific = in_upwork_group & df["is_upwork_ref"].to_numpy()
+    is_velocity_real = in_vg_other_group & df["ref_eq_uid"].to_numpy()
+    has_cxp_uid = df["has_cxp_uid"].to_numpy()
+    updated_by_bi = has_cxp_uid & df["updated_by_bi_service"].to_numpy()
+    
+    base = (
+        (has_cxp_uid.astype(np.int64) * CXP_UID_BIT)
+        | (updated_by_bi.astype(np.int64) * UPDATED_BY_BI_BIT)
+        | (df["Tickets"].to_numpy().astype(np.int64) + TICKETS_OFFSET)
+    )
+    return np.where(is_velocity_real, VELOCITY_REAL_BIT, np.where(is_upwork_specific, UPWORK_SPECIFIC_BIT, base))
+
+def choose_primary_contact(score: np.ndarray, group: np.ndarray) -> int:
+    """
+    Pick the primary of an (email, account) group by its priority score.
+    group holds positional row indices into the frame; returns the primary's position within group.
+    """
+    return int(np.argmax(score[group]))
+
+def _pick_primaries(group_offsets: np.ndarray, group_indices: np.ndarray, score: np.ndarray) -> np.ndarray:
+    """
+    Position in group_indices of every group's primary, given groups as CSR-style arrays: group g is
+    group_indices[group_offsets[g]:group_offsets[g + 1]]. Ties go to the first row, like np.argmax.
+    """
+    out_primary = np.empty(len(group_offsets) - 1, np.int64)
+    for g in prange(len(group_offsets) - 1):
+        start, end = group_offsets[g], group_offsets[g + 1]
+        best = start
+        for k in range(start + 1, end):
+            if score[group_indices[k]] > score[group_indices[best]]:
+                best = k
+        out_primary[g] = best
+    return out_primary
+
+if njit is not None:
+    pick_primaries = njit(cache=True, parallel=True)(_pick_primaries)
+else:
+    def pick_primaries(group_offsets: np.ndarray, group_indices: np.ndarray, score: np.ndarray) -> np.ndarray:
+        return np.array([
+            start + choose_primary_contact(score, group_indices[start:end])
+            for start, end in zip(group_offsets[:-1].tolist(), group_offsets[1:].tolist())
+        ], dtype=np.int64)
+
+def find_merge_pairs(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (primary_rows, duplicate_rows): one entry per merge, as positional indices into df.
+    """
+    order, offsets, group_ids = group_contacts(df)
+    score = priority_scores(df, group_ids)
+    
+    # Keep only groups with something to merge, as CSR arrays over their rows
+    all_sizes = np.diff(offsets)
+    has_duplicates = all_sizes >= 2
+    if not has_duplicates.any():
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    sizes = all_sizes[has_duplicates]
+    group_indices = order[np.repeat(has_duplicates, all_sizes)].astype(np.int64, copy=False)
+    group_offsets = np.concatenate([[0], np.cumsum(sizes)])
+    
+    # The primaries' positions are known, so duplicates are every other position; no row comparisons needed
+    primary_positions = pick_primaries(group_offsets, group_indices, score)
+    is_duplicate = np.ones(len(group_indices), dtype=bool)
+    is_duplicate[primary_positions] = False
+    primary_rows = np.repeat(group_indices[primary_positions], sizes)
+    return primary_rows[is_duplicate], group_indices[is_duplicate]
+
+def iter_merge_batches(df: pd.DataFrame, primary_rows: np.ndarray, duplicate_rows: np.ndarray,
+                       batch_size: int = BATCH_SIZE) -> Iterator[List[Tuple[ExternalContact, ExternalContact]]]:
+    """
+    Yield the merge actions (primary, duplicate) in batches of batch_size pairs.
+    Contacts are materialized one batch at a time, so only the current batch is held in memory.
+    """
+    for start in range(0, len(primary_rows), batch_size):
+        primaries = primary_rows[start:start + batch_size]
+        duplicates = duplicate_rows[start:start + batch_size]
+        rows = np.union1d(primaries, duplicates).tolist()
+        contacts = dict(zip(rows, contacts_from_frame(df, rows)))
+        yield [(contacts[p], contacts[d]) for p, d in zip(primaries.tolist(), duplicates.tolist())]
 
 def backup_contact(contact: ExternalContact) -> bool:
     """
     Backup the full contact details using the DevRev API (rev-users.get) and save it as a JSON file.
     """
-    backup_endpoint = "/rev-users/get"
-    url = f"{DEVREV_BASE_URL.rstrip('/')}{backup_endpoint}"
-    payload = {"id": contact.user_id}
-    headers = {
-        "Authorization": f"Bearer {DEVREV_API_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = SESSION.post(_BACKUP_URL, json={"id": contact.user_id}, headers=_HEADERS, timeout=10)
         response.raise_for_status()
         backup_data = response.json()
         
-        backup_dir = "backups"
-        os.makedirs(backup_dir, exist_ok=True)
-        backup_filename = os.path.join(
-            backup_dir,
-            f"backup_{contact.user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        )
+        backup_filename = os.path.join(BACKUP_DIR, f"backup_{contact.user_id}_{RUN_TIMESTAMP}.json")
         with open(backup_filename, "w", encoding="utf-8") as f:
             json.dump(backup_data, f, indent=2)
-        logger.info(f"Backup saved for contact {contact.user_id} at {backup_filename}")
+        logger.info("Backup saved for contact %s at %s", contact.user_id, backup_filename)
         return True
     except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error during backup for {contact.user_id}: {e.response.status_code} - {e.response.text}")
+        logger.error("HTTP error during backup for %s: %s - %s", contact.user_id, e.response.status_code, e.response.text)
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error during backup for {contact.user_id}: {str(e)}")
+        logger.error("Error during backup for %s: %s", contact.user_id, e)
     return False
 
 def perform_merge(primary: ExternalContact, duplicate: ExternalContact) -> bool:
     """
     Call the DevRev merge API endpoint to merge the duplicate into the primary contact.
     """
-    merge_endpoint = "/rev-users/merge"
-    url = f"{DEVREV_BASE_URL.rstrip('/')}{merge_endpoint}"
     payload = {
         "primary_user": primary.user_id,
         "secondary_user": duplicate.user_id
     }
-    headers = {
-        "Authorization": f"Bearer {DEVREV_API_TOKEN}",
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = SESSION.post(_MERGE_URL, json=payload, headers=_HEADERS, timeout=10)
         response.raise_for_status()
-        logger.info(f"Merge successful: {primary.external_ref} <== {duplicate.external_ref}")
+        logger.info("Merge successful: %s <== %s", primary.external_ref, duplicate.external_ref)
         return True
     except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error during merge: {e.response.status_code} - {e.response.text}")
+        logger.error("HTTP error during merge: %s - %s", e.response.status_code, e.response.text)
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error during merge: {str(e)}")
+        logger.error("Error during merge: %s", e)
     return False
 
-def save_merge_report(merge_actions: List[Tuple[ExternalContact, ExternalContact]]) -> None:
-    report = {
+def write_report_header(report: BinaryIO, total_merge_actions: int) -> None:
+    """
+    The report is NDJSON: a header line with the run summary, then one line per merge action.
+    """
+    report.write(orjson.dumps({
         "timestamp": datetime.now().isoformat(),
-        "total_merge_actions": len(merge_actions),
-        "merge_actions": []
-    }
-    for primary, duplicate in merge_actions:
-        report["merge_actions"].append({
+        "total_merge_actions": total_merge_actions
+    }) + b"\n")
+
+def write_report_actions(report: BinaryIO, batch: List[Tuple[ExternalContact, ExternalContact]]) -> None:
+    for primary, duplicate in batch:
+        report.write(orjson.dumps({
             "primary": primary.to_dict(),
             "duplicate": duplicate.to_dict()
-        })
-    report_filename = f"dedupe_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(report_filename, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
-    logger.info(f"Structured report saved to {report_filename}")
+        }) + b"\n")
 
-def dedupe_contacts(contacts: List[ExternalContact], dry_run: bool) -> None:
-    groups = group_contacts_by_email(contacts)
-    merge_actions = []  # List of tuples (primary, duplicate)
-    for email, group in groups.items():
-        if len(group) < 2:
-            continue
-        _, merges = choose_primary_contact(group)
-        merge_actions.extend(merges)
-    
-    logger.info(f"Identified {len(merge_actions)} merge actions.")
+def backup_contacts(contacts: Iterable[ExternalContact], executor: ThreadPoolExecutor, backed_up: Set[str]) -> None:
+    """
+    Backup each distinct contact not yet in backed_up, with the rev-users.get calls running concurrently.
+    User ids whose backup succeeded are added to backed_up; failed ones are retried the next time they come up.
+    """
+    pending = {contact.user_id: contact for contact in contacts if contact.user_id not in backed_up}
+    futures = {executor.submit(backup_contact, contact): user_id for user_id, contact in pending.items()}
+    backed_up.update(futures[future] for future in as_completed(futures) if future.result())
+
+def merge_batch(batch: List[Tuple[ExternalContact, ExternalContact]], executor: ThreadPoolExecutor, backed_up: Set[str]) -> int:
+    """
+    Backup every contact of a batch of pairs concurrently, then merge, in order, the pairs whose contacts were both backed up.
+    backed_up holds the user ids already backed up during this run. Returns the number of successful merges.
+    """
+    backup_contacts((contact for pair in batch for contact in pair), executor, backed_up)
     
-    for primary, duplicate in merge_actions:
-        logger.info(f"Merge Action: Merge duplicate {duplicate.external_ref} (Account: {duplicate.devrev_account_id}) into primary {primary.external_ref}")
-        if not dry_run:
-            # Backup primary and duplicate before merging
-            if not backup_contact(primary):
-                logger.error(f"Backup failed for primary {primary.user_id}. Skipping merge for this pair.")
-                continue
-            if not backup_contact(duplicate):
-                logger.error(f"Backup failed for duplicate {duplicate.user_id}. Skipping merge for this pair.")
-                continue
-            
-            success = perform_merge(primary, duplicate)
-            if not success:
-                logger.error("Merge failed for this pair.")
+    # Merges run one at a time in pair order: a user can be the primary of one pair and the
+    # duplicate of another, so the order of merges matters.
+    merged = 0
+    for primary, duplicate in batch:
+        if primary.user_id not in backed_up:
+            logger.error("Backup failed for primary %s. Skipping merge for this pair.", primary.user_id)
+            continue
+        if duplicate.user_id not in backed_up:
+            logger.error("Backup failed for duplicate %s. Skipping merge for this pair.", duplicate.user_id)
+            continue
+        if perform_merge(primary, duplicate):
+            merged += 1
         else:
-            logger.info("Dry run mode: No merge performed.")
+            logger.error("Merge failed for this pair.")
+    return merged
+
+def dedupe_contacts(df: pd.DataFrame, dry_run: bool, workers: int = MAX_WORKERS) -> None:
+    primary_rows, duplicate_rows = find_merge_pairs(df)
+    logger.info(f"Identified {len(primary_rows)} merge actions.")
     
-    save_merge_report(merge_actions)
+    # Each batch flows group -> backup -> merge -> report before the next one is materialized
+    report_filename = f"dedupe_report_{RUN_TIMESTAMP}.ndjson"
+    if not dry_run:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+    mount_backup_adapter(workers)  # a pool smaller than the thread count would drop and reopen connections
+    merged = 0
+    backed_up: Set[str] = set()  # a primary shared by many pairs is only backed up once per run
+    with open(report_filename, "wb") as report, ThreadPoolExecutor(max_workers=workers) as executor:
+        write_report_header(report, len(primary_rows))
+        for batch in iter_merge_batches(df, primary_rows, duplicate_rows):
+            if logger.isEnabledFor(logging.INFO):
+                for primary, duplicate in batch:
+                    logger.info(
+                        "Merge Action: Merge duplicate %s (Account: %s) into primary %s",
+                        duplicate.external_ref, duplicate.devrev_account_id, primary.external_ref
+                    )
+                    if dry_run:
+                        logger.info("Dry run mode: No merge performed.")
+            if not dry_run:
+                # Backup primary and duplicate before merging
+                merged += merge_batch(batch, executor, backed_up)
+            write_report_actions(report, batch)
+    
+    if not dry_run:
+        logger.info(f"Merged {merged} of {len(primary_rows)} pairs.")
+    logger.info(f"Structured report saved to {report_filename}")
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Configure logging for a script run. Records are put on a queue by the calling (possibly worker) thread
+    and written by a single listener thread, so worker threads never wait on the console stream.
+    The caller must stop the returned listener to flush remaining records.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))  # only merges the args; the listener's handler adds the prefix
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
 
 def main():
     parser = argparse.ArgumentParser(
@@ -243,11 +541,16 @@ def main():
     )
     parser.add_argument("--csv", required=True, help="Path to the CSV file containing contact pivot data")
     parser.add_argument("--dry-run", action="store_true", help="Run in dry run mode (do not perform actual merges)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help=f"Number of concurrent backup API calls (default: {MAX_WORKERS})")
     args = parser.parse_args()
 
-    contacts = load_contacts(args.csv)
-    dedupe_contacts(contacts, args.dry_run)
-    logger.info("Dedupe process completed.")
+    log_listener = configure_logging()
+    try:
+        df = load_contacts(args.csv)
+        dedupe_contacts(df, args.dry_run, args.workers)
+        logger.info("Dedupe process completed.")
+    finally:
+        log_listener.stop()
 
 if __name__ == "__main__":
     main()
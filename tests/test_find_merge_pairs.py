@@ -0,0 +1,67 @@
+import dedupe_external_contacts as dedupe
+
+
+def write_contacts(tmp_path, rows):
+    """Write rows given as {column: value} dicts (unset columns empty) as a pivot CSV."""
+    lines = [",".join(dedupe.CSV_COLUMNS)]
+    lines += [",".join(row.get(col, "") for col in dedupe.CSV_COLUMNS) for row in rows]
+    path = tmp_path / "contacts.csv"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def merge_pairs(csv_path):
+    df = dedupe.load_contacts(csv_path)
+    primary_rows, duplicate_rows = dedupe.find_merge_pairs(df)
+    refs = df["External Ref"].to_numpy()
+    return list(zip(refs[primary_rows].tolist(), refs[duplicate_rows].tolist()))
+
+
+def test_negative_ticket_counts_keep_their_order(tmp_path):
+    csv_path = write_contacts(tmp_path, [
+        {"Email": "a@x.com", "External Ref": "r1", "User ID": "u1", "Devrev Account ID": "acc", "Tickets": "-5"},
+        {"Email": "a@x.com", "External Ref": "r2", "User ID": "u2", "Devrev Account ID": "acc", "Tickets": "-1"},
+    ])
+    assert merge_pairs(csv_path) == [("r2", "r1")]
+
+
+def contact(email, account, external_ref, user_id, tickets="0", **columns):
+    row = {"Email": email, "Devrev Account ID": account, "External Ref": external_ref, "User ID": user_id,
+           "Tickets": tickets}
+    row.update({name.replace("_", " "): value for name, value in columns.items()})
+    return row
+
+
+def test_merge_pairs_and_their_order(tmp_path):
+    csv_path = write_contacts(tmp_path, [
+        contact("b@x.com", "A", "user_B1", "u1", "1"),
+        contact("a@x.com", "A", "r1", "u2", "3"),
+        contact("b@x.com", "A", "r3", "u3", "9"),
+        # Several CXP UIDs: updated by BI first, then tickets; the first of a tie wins
+        contact("a@x.com", "A", "user_A1", "u4", "2", Updated_by_BI_service="TRUE"),
+        contact("a@x.com", "A", "user_A2", "u5", "2", Updated_by_BI_service="true"),
+        contact("a@x.com", "A", "user_A3", "u6", "7", Updated_by_BI_service="FALSE"),
+        # Upwork group: the first Upwork-specific External Ref wins over tickets
+        contact("A@x.com", "B", "r7", "u7", "5", Type="Upwork Freelancer"),
+        contact("a@x.com", "B", "upwork_8", "u8"),
+        contact("a@x.com", "B", "UPWORK_9", "u9"),
+        # Velocity Global - OTHER group: the row whose External Ref equals its User ID wins
+        contact("a@x.com", "C", "r10", "u10", "4", Devrev_Account_Name="Velocity Global - OTHER"),
+        contact("a@x.com", "C", "u11", "u11"),
+        contact("c@x.com", "A", "r12", "u1"),
+        contact("c@x.com", "A", "r13", "u13", "1"),
+        contact("d@x.com", "A", "r14", "u14"),
+        contact("test@x.com", "A", "r15", "u15"),
+        contact("test@x.com", "A", "r16", "u16"),
+    ])
+    # Groups appear in order of their email's first row, then of their account's first row within the email
+    assert merge_pairs(csv_path) == [
+        ("user_B1", "r3"),
+        ("user_A1", "r1"),
+        ("user_A1", "user_A2"),
+        ("user_A1", "user_A3"),
+        ("upwork_8", "r7"),
+        ("upwork_8", "UPWORK_9"),
+        ("u11", "r10"),
+        ("r13", "r12"),
+    ]
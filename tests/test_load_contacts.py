@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import dedupe_external_contacts as dedupe
+
+HEADER = ",".join(dedupe.CSV_COLUMNS)
+
+
+def make_row(email, external_ref, user_id, tickets="0"):
+    values = dict.fromkeys(dedupe.CSV_COLUMNS, "")
+    values.update({
+        "Email": email,
+        "External Ref": external_ref,
+        "Modified By Name": "DevRev Bot",
+        "User ID": user_id,
+        "Devrev Account ID": "acc",
+        "Tickets": tickets,
+    })
+    return ",".join(values[col] for col in dedupe.CSV_COLUMNS)
+
+
+def write_csv(tmp_path, lines):
+    path = tmp_path / "contacts.csv"
+    path.write_text("\n".join([HEADER] + lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_extra_field_on_first_row_does_not_shift_columns(tmp_path):
+    csv_path = write_csv(tmp_path, [
+        make_row("a@x.com", "r1", "u1", "3") + ",EXTRA",
+        make_row("b@x.com", "r2", "u2", "4"),
+    ])
+    df = dedupe.read_pivot_csv(csv_path)
+    assert list(df.columns) == dedupe.CSV_COLUMNS
+    assert df["Email"].tolist() == ["a@x.com", "b@x.com"]
+    assert df["User ID"].tolist() == ["u1", "u2"]
+    assert df["Tickets"].tolist() == ["3", "4"]
+
+
+def test_extra_fields_on_later_row_are_ignored(tmp_path):
+    csv_path = write_csv(tmp_path, [
+        make_row("a@x.com", "r1", "u1", "3"),
+        make_row("b@x.com", "r2", "u2", "4") + ",EXTRA,MORE",
+        make_row("c@x.com", "r3", "u3", "5"),
+    ])
+    df = dedupe.read_pivot_csv(csv_path)
+    assert df["Email"].tolist() == ["a@x.com", "b@x.com", "c@x.com"]
+    assert df["User ID"].tolist() == ["u1", "u2", "u3"]
+    assert df["Tickets"].tolist() == ["3", "4", "5"]
+
+
+def test_parquet_cache_is_reused_for_unchanged_csv(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path, [make_row("a@x.com", "r1", "u1")])
+    first = dedupe.read_pivot_table(csv_path)
+    monkeypatch.setattr(dedupe, "read_pivot_csv", lambda path: pytest.fail("CSV was reparsed"))
+    assert dedupe.read_pivot_table(csv_path).equals(first)
+
+
+def test_parquet_cache_is_rebuilt_when_csv_is_replaced_with_older_mtime(tmp_path):
+    csv_path = write_csv(tmp_path, [make_row("a@x.com", "r1", "u1")])
+    dedupe.read_pivot_table(csv_path)
+    old_mtime = os.path.getmtime(csv_path) - 3600
+
+    # A new export copied in with its (older) original mtime preserved, e.g. by cp -p
+    write_csv(tmp_path, [make_row("b@x.com", "r2", "u2")])
+    os.utime(csv_path, (old_mtime, old_mtime))
+    assert dedupe.read_pivot_table(csv_path)["Email"].tolist() == ["b@x.com"]